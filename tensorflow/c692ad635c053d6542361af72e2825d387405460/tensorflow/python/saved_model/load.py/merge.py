@@ -18,10 +18,18 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import functools
+import collections
+import contextlib
+import mmap
+import os
 import sys
+import weakref
+
+from google.protobuf import message
+import numpy as np
 
 from tensorflow.core.protobuf import graph_debug_info_pb2
+from tensorflow.core.protobuf import saved_model_pb2
 from tensorflow.python.distribute import distribute_utils
 from tensorflow.python.distribute import distribution_strategy_context as ds_context
 from tensorflow.python.distribute import values_util
@@ -40,6 +48,7 @@ from tensorflow.python.ops import handle_data_util
 from tensorflow.python.ops import lookup_ops
 from tensorflow.python.ops import resource_variable_ops
 from tensorflow.python.ops import variables
+from tensorflow.python.saved_model import constants
 from tensorflow.python.saved_model import function_deserialization
 from tensorflow.python.saved_model import load_options
 from tensorflow.python.saved_model import load_v1_in_v2
@@ -61,19 +70,196 @@ from tensorflow.python.util.tf_export import tf_export
 # API label for SavedModel metrics.
 _LOAD_V2_LABEL = "load_v2"
 
+# SavedModels store tensor_content in little-endian byte order, which needs to
+# be swapped when loading on big-endian hosts.
+_IS_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def _constant_to_ndarray(tensor_proto):
+  """Converts the `TensorProto` of a saved constant to a NumPy array.
+
+  Unlike `tensor_util.MakeNdarray`, values serialized in `tensor_content` are
+  returned as a read-only view of the proto's bytes instead of a copy; the
+  array is only used to create a constant tensor, which does not modify it.
+
+  Args:
+    tensor_proto: A `TensorProto`.
+
+  Returns:
+    A NumPy array with the values of `tensor_proto`.
+  """
+  tensor_content = tensor_proto.tensor_content
+  dtype = dtypes.as_dtype(tensor_proto.dtype)
+  if tensor_content and dtype != dtypes.string:
+    shape = [dim.size for dim in tensor_proto.tensor_shape.dim]
+    return np.frombuffer(
+        tensor_content, dtype=dtype.as_numpy_dtype).reshape(shape)
+  return tensor_util.MakeNdarray(tensor_proto)
+
+
+# The coder is stateless, so a single instance is shared by all loads.
+_STRUCTURE_CODER = nested_structure_coder.StructureCoder()
+
+
+def _has_object_graph(saved_model_proto):
+  """Returns whether a SavedModel was saved by `tf.saved_model.save`."""
+  return (len(saved_model_proto.meta_graphs) == 1 and
+          saved_model_proto.meta_graphs[0].HasField("object_graph_def"))
+
+
+def _parse_saved_model(export_dir):
+  """Parses a SavedModel, converting its constants to the host byte order.
+
+  Args:
+    export_dir: The SavedModel directory.
+
+  Returns:
+    A `SavedModel` protocol buffer.
+  """
+  saved_model_proto = _read_saved_model(export_dir)
+  # tensor_content field contains raw bytes in litle endian format
+  # which causes problems when loaded on big-endian systems
+  # requiring byteswap
+  if _IS_BIG_ENDIAN and _has_object_graph(saved_model_proto):
+    _swap_function_tensor_content(saved_model_proto.meta_graphs[0])
+  return saved_model_proto
+
+
+# Size in bytes of the values to byte swap for each multi-byte dtype. Complex
+# numbers are swapped as whole elements, matching
+# `saved_model_utils.byte_swap_tensor_content` (used by `save.py`).
+_BYTE_SWAP_SIZES = {
+    dtype.as_datatype_enum: size for dtype, size in (
+        (dtypes.float16, 2), (dtypes.bfloat16, 2), (dtypes.float32, 4),
+        (dtypes.float64, 8), (dtypes.complex64, 8), (dtypes.complex128, 16),
+        (dtypes.int16, 2), (dtypes.int32, 4), (dtypes.int64, 8),
+        (dtypes.uint16, 2), (dtypes.uint32, 4), (dtypes.uint64, 8),
+        (dtypes.qint16, 2), (dtypes.quint16, 2), (dtypes.qint32, 4))}
+
+
+def _swap_function_tensor_content(meta_graph_def):
+  """Converts the function library's constants to big-endian byte order.
+
+  `tensor_content` is serialized in little-endian byte order. This is the
+  equivalent of `saved_model_utils.swap_function_tensor_content(meta_graph_def,
+  "little", "big")`, but swaps whole tensors with NumPy instead of element by
+  element in Python.
+
+  Args:
+    meta_graph_def: The `MetaGraphDef` to modify in place.
+  """
+  for function in meta_graph_def.graph_def.library.function:
+    for node in function.node_def:
+      if node.op != "Const":
+        continue
+      tensor = node.attr["value"].tensor
+      size = _BYTE_SWAP_SIZES.get(tensor.dtype)
+      if size is None:
+        continue
+      tensor_content = tensor.tensor_content
+      if tensor_content:
+        # Reverses the bytes of each element.
+        tensor.tensor_content = np.frombuffer(
+            tensor_content, dtype=np.uint8).reshape(-1, size)[:, ::-1].tobytes()
+
+
+def _read_saved_model(export_dir):
+  """Parses `saved_model.pb`, memory-mapping it if it is a local file.
+
+  Parsing straight from the memory map avoids first reading the serialized
+  SavedModel into a `bytes` object, which roughly halves peak memory use when
+  loading large models. Other SavedModels (e.g. on remote filesystems or saved
+  as text) are read by `loader_impl.parse_saved_model`.
+
+  Args:
+    export_dir: The SavedModel directory.
+
+  Returns:
+    A `SavedModel` protocol buffer.
+
+  Raises:
+    IOError: If the SavedModel file can't be read or parsed.
+  """
+  path = os.path.join(os.fsdecode(export_dir),
+                      constants.SAVED_MODEL_FILENAME_PB)
+  try:
+    with open(path, "rb") as saved_model_file:
+      mapped_file = mmap.mmap(saved_model_file.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+  except (OSError, ValueError):
+    # The file is missing (e.g. the SavedModel was saved as text), not local,
+    # empty, or on a filesystem that doesn't support memory-mapping.
+    return loader_impl.parse_saved_model(export_dir)
+
+  saved_model_proto = saved_model_pb2.SavedModel()
+  # The view must be released before the map can be closed.
+  with contextlib.closing(mapped_file), memoryview(mapped_file) as serialized:
+    try:
+      saved_model_proto.ParseFromString(serialized)
+    except message.DecodeError as e:
+      raise IOError("Cannot parse file {}: {}.".format(path, str(e)))
+  return saved_model_proto
+
+
+def _read_debug_info(export_dir):
+  """Parses the debug info of a SavedModel.
+
+  Args:
+    export_dir: The SavedModel directory.
+
+  Returns:
+    A `GraphDebugInfo` protocol buffer, empty if the SavedModel has no debug
+    info.
+
+  Raises:
+    IOError: If the debug info file can't be parsed.
+  """
+  debug_info_path = file_io.join(
+      saved_model_utils.get_debug_dir(export_dir),
+      constants.DEBUG_INFO_FILENAME_PB)
+  debug_info = graph_debug_info_pb2.GraphDebugInfo()
+  if file_io.file_exists(debug_info_path):
+    with file_io.FileIO(debug_info_path, "rb") as debug_file:
+      try:
+        debug_info.ParseFromString(debug_file.read())
+      except message.DecodeError as e:
+        raise IOError("Cannot parse file {}: {}.".format(debug_info_path,
+                                                         str(e)))
+  return debug_info
+
+
+# Maps graphs to weak references to the placeholder `_unused_handle` created in
+# them. The placeholder is owned by (and refers to) its graph, so holding it
+# strongly would keep the graph alive.
+_UNUSED_HANDLES = weakref.WeakKeyDictionary()
+
 
 def _unused_handle():
-  """Returns a placeholder as a handle that is not supposed to be accessed."""
+  """Returns a placeholder as a handle that is not supposed to be accessed.
+
+  The placeholder is created once per graph and shared by all calls in it.
+  """
+  graph = ops.get_default_graph()
+  handle_ref = _UNUSED_HANDLES.get(graph)
+  handle = handle_ref() if handle_ref is not None else None
+  if handle is not None:
+    return handle
+
   error_message = ("Trying to access a placeholder that is not supposed to be "
                    "executed. This means you are executing a graph generated "
                    "from the cross-replica context in an in-replica context.")
 
-  assert_op = control_flow_ops.Assert(
-      array_ops.placeholder_with_default(False, shape=()),
-      [error_message])
+  # Clear the caller's control dependencies and control flow context, so that
+  # the placeholder can be reused anywhere in the graph.
+  with ops.control_dependencies(None):
+    assert_op = control_flow_ops.Assert(
+        array_ops.placeholder_with_default(False, shape=()),
+        [error_message])
 
-  with ops.control_dependencies([assert_op]):
-    return array_ops.placeholder(dtype=dtypes.resource)
+    with ops.control_dependencies([assert_op]):
+      handle = array_ops.placeholder(dtype=dtypes.resource)
+  _UNUSED_HANDLES[graph] = weakref.ref(handle)
+  return handle
 
 
 class _WrapperFunction(function.ConcreteFunction):
@@ -95,15 +281,20 @@ class _WrapperFunction(function.ConcreteFunction):
   def __init__(self, concrete_function):
     # Shallow copy the concrete_function
     self.__dict__.update(vars(concrete_function))
+    # Maps the ids of the distributed variables among the captured inputs to
+    # the variables. Set by the Loader once the captures are known; until then
+    # the captured inputs are checked on every call.
+    self._distributed_captures = None
 
   def _call_flat(self, args, captured_inputs, cancellation_manager=None):
-
-    def get_handle(x):
-      return x.handle if distribute_utils.is_distributed_variable(x) else x
-
-    def get_unused_handle(x):
-      return _unused_handle() if distribute_utils.is_distributed_variable(x)   \
-          else x
+    distributed_captures = self._distributed_captures
+    if distributed_captures is None:
+      distributed_captures = {
+          id(x): x for x in captured_inputs
+          if distribute_utils.is_distributed_variable(x)}
+    if not distributed_captures:
+      return super(_WrapperFunction, self)._call_flat(args, captured_inputs,
+                                                      cancellation_manager)
 
     if (ds_context.get_replica_context() is not None or
         values_util.is_saving_non_distributed()):
@@ -115,13 +306,30 @@ class _WrapperFunction(function.ConcreteFunction):
       # a non-distributed version of the model, var.handle resolves to the
       # primary variable handle, since we only save one copy of a replicated
       # variable.
-      captured_inputs = list(map(get_handle, captured_inputs))
+      captured_inputs = [x.handle if id(x) in distributed_captures else x
+                         for x in captured_inputs]
     else:  # cross-replica context
-      captured_inputs = list(map(get_unused_handle, captured_inputs))
+      captured_inputs = [
+          _unused_handle() if id(x) in distributed_captures else x
+          for x in captured_inputs]
     return super(_WrapperFunction, self)._call_flat(args, captured_inputs,
                                                     cancellation_manager)
 
 
+# Maps each `kind` of SavedObject to the `Loader` method that recreates it. The
+# methods are looked up by name so that subclasses can override them.
+_RECREATE_METHODS = {
+    "user_object": "_recreate_user_object",
+    "asset": "_recreate_asset",
+    "function": "_recreate_function",
+    "bare_concrete_function": "_recreate_bare_concrete_function",
+    "variable": "_recreate_variable",
+    "constant": "_recreate_constant",
+    "resource": "_recreate_resource",
+    "captured_tensor": "_get_tensor_from_fn",
+}
+
+
 class Loader(object):
   """Helper class to load an object-based SavedModel."""
 
@@ -129,9 +337,13 @@ class Loader(object):
                ckpt_options, save_options, filters):
     meta_graph = saved_model_proto.meta_graphs[0]
     self._asset_file_def = meta_graph.asset_file_def
-    self._operation_attributes = {
-        node.name: node.attr for node in meta_graph.graph_def.node}
     self._proto = object_graph_proto
+    # Indexing a protobuf repeated field is much slower than indexing a list,
+    # and the nodes are walked several times during loading.
+    self._proto_nodes = list(object_graph_proto.nodes)
+    # The `kind` oneof of each node, looked up once since `WhichOneof` is
+    # comparatively expensive.
+    self._node_kinds = [node.WhichOneof("kind") for node in self._proto_nodes]
     self._export_dir = export_dir
     self._concrete_functions = (
         function_deserialization.load_function_def_library(
@@ -159,6 +371,21 @@ class Loader(object):
     # loaded. This list includes ids of child nodes.
     self._filtered_nodes = self._retrieve_all_filtered_nodes()
 
+    # Only saved constants read the attributes of their GraphDef node, so skip
+    # the (often much more numerous) other nodes.
+    constant_operations = set(
+        proto.constant.operation for node_id, proto in self._iter_all_nodes()
+        if self._node_kinds[node_id] == "constant")
+    self._operation_attributes = {
+        node.name: node.attr for node in meta_graph.graph_def.node
+        if node.name in constant_operations}
+    # Concrete functions are set up in a deterministic order.
+    function_names = self._get_loaded_concrete_function_names()
+    self._sorted_concrete_functions = sorted(
+        (name, proto)
+        for name, proto in self._proto.concrete_functions.items()
+        if function_names is None or name in function_names)
+
     self._load_all()
 
     if not save_options.experimental_skip_checkpoint:
@@ -173,6 +400,9 @@ class Loader(object):
     """Maps all string node paths in node_filters to the int node ids."""
     if self._node_filters is None:
       return None
+    # Maps the ids of nodes on the resolved paths to {local_name: child node
+    # id} dicts, so that paths sharing a prefix don't rescan its children.
+    self._child_index = {}
     path_to_int = {}
     for node_id in self._node_filters:
       int_node_id = None
@@ -206,11 +436,13 @@ class Loader(object):
       return None  # All nodes should be loaded.
 
     all_filtered_nodes = set()
-    nodes_to_visit = list(self._node_filters)
+    # Queue of (node path, node id) pairs.
+    nodes_to_visit = collections.deque(
+        (node_path, self._node_path_to_id[node_path])
+        for node_path in self._node_filters)
 
     while nodes_to_visit:
-      node_path = nodes_to_visit.pop(0)
-      node_id = self._node_path_to_id[node_path]
+      node_path, node_id = nodes_to_visit.popleft()
       if node_id in all_filtered_nodes:
         continue
       all_filtered_nodes.add(node_id)
@@ -225,7 +457,7 @@ class Loader(object):
               .format(node_path))
         node._maybe_initialize_trackable()  # pylint: disable=protected-access
 
-      for reference in self._proto.nodes[node_id].children:
+      for reference in self._proto_nodes[node_id].children:
         child_object, _ = self._loaded_nodes.get(
             reference.node_id, (None, None))
 
@@ -240,19 +472,44 @@ class Loader(object):
 
             self._loaded_nodes[reference.node_id] = (child_object, setter)
 
-        child_path = "{}.{}".format(node_path, reference.local_name)
+        child_path = node_path + "." + reference.local_name
         self._node_path_to_id[child_path] = reference.node_id
-        nodes_to_visit.append(child_path)
+        if reference.node_id not in all_filtered_nodes:
+          nodes_to_visit.append((child_path, reference.node_id))
 
     if 0 in all_filtered_nodes:
       return None
     return all_filtered_nodes
 
+  def _get_loaded_concrete_function_names(self):
+    """Returns the names of the concrete functions used by the loaded nodes.
+
+    Returns:
+      A set of concrete function names, or None if all nodes are loaded.
+    """
+    if self._filtered_nodes is None:
+      return None
+    function_names = set()
+    for node_id, proto in self._iter_all_nodes():
+      kind = self._node_kinds[node_id]
+      if kind == "function":
+        function_names.update(proto.function.concrete_functions)
+      elif kind == "bare_concrete_function":
+        function_names.add(proto.bare_concrete_function.concrete_function_name)
+      elif kind == "captured_tensor":
+        function_names.add(proto.captured_tensor.concrete_function)
+    return function_names
+
   def _find_node_child(self, node_id, child_name, path):
-    for reference in self._proto.nodes[node_id].children:
-      if reference.local_name == child_name:
-        return reference.node_id
-    raise ValueError("unable to find node {}".format(path))
+    children = self._child_index.get(node_id)
+    if children is None:
+      children = {reference.local_name: reference.node_id
+                  for reference in self._proto_nodes[node_id].children}
+      self._child_index[node_id] = children
+    child_id = children.get(child_name)
+    if child_id is None:
+      raise ValueError("unable to find node {}".format(path))
+    return child_id
 
   def _load_all(self):
     """Loads all nodes and functions from the SavedModel and their edges."""
@@ -265,22 +522,25 @@ class Loader(object):
     self._setup_functions_structures()
     self._setup_functions_captures()
 
-    self._create_saveable_object_factories()
-
-  def _create_saveable_object_factories(self):
-    for node_id, proto in self._iter_all_nodes():
-      node = self.get(node_id)
-      node._self_saveable_object_factories = {}  # pylint: disable=protected-access
-      for name, saveable_object_proto in proto.saveable_objects.items():
-        node._self_saveable_object_factories[name] = (  # pylint: disable=protected-access
-            saveable_object_util.restored_saved_object_factory(
-                self.get(saveable_object_proto.save_function),
-                self.get(saveable_object_proto.restore_function)))
+  def _add_saveable_object_factories(self, proto, node_id):
+    """Attaches the restored saveable object factories to a node."""
+    node = self.get(node_id)
+    node._self_saveable_object_factories = {}  # pylint: disable=protected-access
+    for name, saveable_object_proto in proto.saveable_objects.items():
+      node._self_saveable_object_factories[name] = (  # pylint: disable=protected-access
+          saveable_object_util.restored_saved_object_factory(
+              self.get(saveable_object_proto.save_function),
+              self.get(saveable_object_proto.restore_function)))
 
   def _load_edges(self):
-    """Adds edges from objects to other objects and functions."""
+    """Adds edges from objects to other objects and functions.
+
+    The saveable object factories only refer to already loaded function nodes,
+    so they are attached in the same pass over the nodes.
+    """
     for node_id, object_proto in self._iter_all_nodes():
       self._add_object_graph_edges(object_proto, node_id)
+      self._add_saveable_object_factories(object_proto, node_id)
 
     # If root object isn't loaded, then create edges from the root for
     # checkpoint compatibility.
@@ -304,16 +564,17 @@ class Loader(object):
 
     for reference in proto.children:
       setter(obj, reference.local_name, self._nodes[reference.node_id])
+      if reference.local_name != "__call__":
+        continue
       # Note: if an object has an attribute `__call__` add a class method
       # that allows `obj()` syntax to work. This is done per-instance to
       # allow `callable` to be used to find out if an object is callable.
-      if reference.local_name == "__call__" and not callable(obj):
+      if not callable(obj):
         setattr(type(obj), "__call__", _call_attribute)
 
   def _setup_functions_structures(self):
     """Setup structure for inputs and outputs of restored functions."""
-    coder = nested_structure_coder.StructureCoder()
-    for name, proto in sorted(self._proto.concrete_functions.items()):
+    for name, proto in self._sorted_concrete_functions:
       concrete_function = self._concrete_functions[name]
       # By setting the structured_outputs directly, we can rely on this
       # function_lib.ConcreteFunction object to perform the output repacking
@@ -321,7 +582,7 @@ class Loader(object):
       # with output that is convertible to Tensors and the conversion
       # always happens. For example tf.TensorShape([2, 3]) will be
       # converted to Tensor representing [2, 3].
-      original_outputs = coder.decode_proto(proto.output_signature)
+      original_outputs = _STRUCTURE_CODER.decode_proto(proto.output_signature)
       # The original_outputs here had Tensors converted to TensorSpecs, so
       # the restored function's structured_outputs field will not be
       # exactly the same. Fortunately the repacking logic cares only about
@@ -329,13 +590,12 @@ class Loader(object):
       # and types.
       concrete_function._func_graph.structured_outputs = original_outputs  # pylint: disable=protected-access
       concrete_function._func_graph.structured_input_signature = (  # pylint: disable=protected-access
-          coder.decode_proto(proto.canonicalized_input_signature))
+          _STRUCTURE_CODER.decode_proto(proto.canonicalized_input_signature))
       concrete_function._initialize_function_spec()  # pylint: disable=protected-access
 
   def _setup_functions_captures(self):
     """Setup captures and variables in restored functions."""
-    concrete_functions = sorted(self._proto.concrete_functions.items())
-    for name, proto in concrete_functions:
+    for name, proto in self._sorted_concrete_functions:
       concrete_function = self._concrete_functions[name]
       bound_inputs = [
           self._get_tensor_from_node(node_id, name)
@@ -343,17 +603,21 @@ class Loader(object):
       bound_variables = [
           self._nodes[node_id]
           for node_id in proto.bound_inputs
-          if self._proto.nodes[node_id].WhichOneof("kind") == "variable"
+          if self._node_kinds[node_id] == "variable"
       ]
       # TODO(andresp): This is only injecting the captured inputs into the
       # concrete function, note that we did not modify the FuncGraph
       # itself.
+      distributed_captures = {
+          id(x): x for x in bound_inputs
+          if distribute_utils.is_distributed_variable(x)}
       concrete_function._captured_inputs = bound_inputs  # pylint: disable=protected-access
+      concrete_function._distributed_captures = distributed_captures  # pylint: disable=protected-access
       concrete_function._func_graph.variables = bound_variables  # pylint: disable=protected-access
       if bound_inputs:
         for bound_input, internal_capture in zip(
             bound_inputs, concrete_function.inputs[-len(bound_inputs):]):
-          if distribute_utils.is_distributed_variable(bound_input):
+          if id(bound_input) in distributed_captures:
             concrete_function.graph.capture_distributed_variable(
                 bound_input, internal_capture)
           else:
@@ -399,8 +663,8 @@ class Loader(object):
       raise ValueError("Can't convert node %s to tensor" % (type(obj)))
 
   def _initialize_loaded_nodes(self):
-    nodes = {}
-    node_setters = {}
+    nodes = [None] * len(self._proto_nodes)
+    node_setters = [None] * len(self._proto_nodes)
     for node_id, (node, setter) in self._loaded_nodes.items():
       nodes[node_id] = node
       node_setters[node_id] = setter
@@ -408,29 +672,32 @@ class Loader(object):
 
   def _iter_all_nodes(self):
     if self._filtered_nodes is None:
-      return enumerate(self._proto.nodes)
+      return enumerate(self._proto_nodes)
     else:
-      return [(node_id, self._proto.nodes[node_id])
+      return [(node_id, self._proto_nodes[node_id])
               for node_id in self._filtered_nodes]
 
   def _load_nodes(self):
     """Load all saved objects."""
-    # `nodes` maps from node ids to recreated objects
-    # `node_setters` maps from node ids to setter functions
+    # `nodes` is indexed by node id and holds the recreated objects
+    # `node_setters` is indexed by node id and holds setter functions
     # (same signature as setattr) for setting dependencies.
     nodes, node_setters = self._initialize_loaded_nodes()
 
     # Figure out which objects are slot variables. These objects are created
     # with Optimizer.add_slot rather than _recreate_variable.
-    slot_variable_node_ids = set()
+    is_slot_variable = bytearray(len(self._proto_nodes))
+    # (optimizer node id, SlotVariableReference) pairs.
+    slot_variables = []
 
-    for _, proto in self._iter_all_nodes():
+    for node_id, proto in self._iter_all_nodes():
       for slot_variable_proto in proto.slot_variables:
-        slot_variable_node_ids.add(slot_variable_proto.slot_variable_node_id)
+        is_slot_variable[slot_variable_proto.slot_variable_node_id] = True
+        slot_variables.append((node_id, slot_variable_proto))
 
     # Re-create everything except slot variables.
     for node_id, proto in self._iter_all_nodes():
-      if node_id in slot_variable_node_ids or nodes.get(node_id) is not None:
+      if is_slot_variable[node_id] or nodes[node_id] is not None:
         # Defer recreating slot variables so we can use the public Optimizer
         # interface.
         continue
@@ -440,24 +707,22 @@ class Loader(object):
 
     # Now that we have created the variables being optimized, we have enough
     # information to re-create slot variables for them.
-    for node_id, proto in self._iter_all_nodes():
+    for node_id, slot_variable_proto in slot_variables:
       optimizer_object = nodes[node_id]
-      for slot_variable_proto in proto.slot_variables:
-        optimized_variable = nodes[
-            slot_variable_proto.original_variable_node_id]
-        slot_variable = optimizer_object.add_slot(
-            var=optimized_variable,
-            slot_name=slot_variable_proto.slot_name)
-        nodes[slot_variable_proto.slot_variable_node_id] = slot_variable
-        node_setters[slot_variable_proto.slot_variable_node_id] = setattr
+      optimized_variable = nodes[
+          slot_variable_proto.original_variable_node_id]
+      slot_variable = optimizer_object.add_slot(
+          var=optimized_variable,
+          slot_name=slot_variable_proto.slot_name)
+      nodes[slot_variable_proto.slot_variable_node_id] = slot_variable
+      node_setters[slot_variable_proto.slot_variable_node_id] = setattr
 
     # If root object is not loaded, add a dummy root object for checkpoint
     # compatibility.
-    if 0 not in nodes:
+    if nodes[0] is None:
       nodes[0] = self._recreate_base_user_object()[0]
 
-    self._nodes = [nodes.get(node_id)
-                   for node_id in range(len(self._proto.nodes))]
+    self._nodes = nodes
     self._node_setters = node_setters
 
   def _restore_checkpoint(self):
@@ -485,6 +750,9 @@ class Loader(object):
       # wire them in the initializers of the objects so that they get
       # initialized properly when using common practices (e.g. the ones used by
       # ManagedSession) without further user action.
+      # Each variable keeps its own initializer so that it can be initialized
+      # on its own, but the restore ops of all tables are registered at once.
+      table_restore_ops = []
       for object_id, obj in dict(checkpoint.object_by_proto_id).items():
         position = base.CheckpointPosition(checkpoint=checkpoint,
                                            proto_id=object_id)
@@ -496,16 +764,22 @@ class Loader(object):
             else:
               obj._initializer_op = control_flow_ops.group(*restore_ops)
           elif isinstance(obj, lookup_ops.LookupInterface):
-            # We don't need to check for eager execution here, since this code
-            # path should only be taken if we are restoring in graph mode.
-            ops.add_to_collection(ops.GraphKeys.TABLE_INITIALIZERS, restore_ops)
+            table_restore_ops.extend(restore_ops)
           else:
             raise NotImplementedError(
                 ("Missing functionality to restore state of object "
                  "%r from the checkpoint." % obj))
+      if table_restore_ops:
+        # We don't need to check for eager execution here, since this code
+        # path should only be taken if we are restoring in graph mode.
+        ops.add_to_collection(ops.GraphKeys.TABLE_INITIALIZERS,
+                              table_restore_ops)
 
   def adjust_debug_info_func_names(self, debug_info):
     """Rewrite func names in the debug info by using the concrete func names."""
+    if not debug_info.traces:
+      # Nothing to rename, e.g. the model was saved without debug info.
+      return debug_info
     output_debug_info = graph_debug_info_pb2.GraphDebugInfo()
     output_debug_info.files[:] = debug_info.files
     for key in debug_info.traces:
@@ -524,24 +798,13 @@ class Loader(object):
 
   def _recreate(self, proto, node_id):
     """Creates a Python object from a SavedObject protocol buffer."""
-    factory = {
-        "user_object": (
-            lambda: self._recreate_user_object(proto.user_object, node_id)),
-        "asset": lambda: self._recreate_asset(proto.asset),
-        "function": lambda: self._recreate_function(proto.function),
-        "bare_concrete_function": functools.partial(
-            self._recreate_bare_concrete_function,
-            proto.bare_concrete_function),
-        "variable": lambda: self._recreate_variable(proto.variable),
-        "constant": lambda: self._recreate_constant(proto.constant),
-        "resource": lambda: self._recreate_resource(proto.resource),
-        "captured_tensor": functools.partial(
-            self._get_tensor_from_fn, proto.captured_tensor),
-    }
-    kind = proto.WhichOneof("kind")
-    if kind not in factory:
+    kind = self._node_kinds[node_id]
+    if kind not in _RECREATE_METHODS:
       raise ValueError("Unknown SavedObject type: %r" % kind)
-    return factory[kind]()
+    recreate_fn = getattr(self, _RECREATE_METHODS[kind])
+    if kind == "user_object":
+      return recreate_fn(proto.user_object, node_id)
+    return recreate_fn(getattr(proto, kind))
 
   def _recreate_user_object(self, proto, node_id):
     """Instantiates a SavedUserObject."""
@@ -610,7 +873,7 @@ class Loader(object):
 
   def _recreate_constant(self, proto):
     tensor_proto = self._operation_attributes[proto.operation]["value"].tensor
-    ndarray = tensor_util.MakeNdarray(tensor_proto)
+    ndarray = _constant_to_ndarray(tensor_proto)
     if dtypes.as_dtype(tensor_proto.dtype) == dtypes.string:
       with ops.device("CPU"):
         imported_constant = constant_op.constant(ndarray)
@@ -870,29 +1133,33 @@ def load_internal(export_dir, tags=None, options=None, loader_cls=Loader,
                   filters=None):
   """Loader implementation."""
   options = options or load_options.LoadOptions()
-  if tags is not None and not isinstance(tags, set):
-    # Supports e.g. tags=SERVING and tags=[SERVING]. Sets aren't considered
-    # sequences for nest.flatten, so we put those through as-is.
-    tags = nest.flatten(tags)
-  saved_model_proto, debug_info = (
-      loader_impl.parse_saved_model_with_debug_info(export_dir))
-
-  if (len(saved_model_proto.meta_graphs) == 1 and
-      saved_model_proto.meta_graphs[0].HasField("object_graph_def")):
+  # Supports e.g. tags=SERVING and tags=[SERVING]. Only nested structures need
+  # to go through nest.flatten.
+  if tags is None:
+    tag_set = None
+  elif isinstance(tags, (str, bytes)):
+    tag_set = frozenset([tags])
+  elif (isinstance(tags, (list, tuple, set, frozenset))
+        and all(isinstance(tag, (str, bytes)) for tag in tags)):
+    tag_set = frozenset(tags)
+  else:
+    tag_set = frozenset(nest.flatten(tags))
+  saved_model_proto = _parse_saved_model(export_dir)
+
+  if _has_object_graph(saved_model_proto):
     meta_graph_def = saved_model_proto.meta_graphs[0]
-    # tensor_content field contains raw bytes in litle endian format
-    # which causes problems when loaded on big-endian systems
-    # requiring byteswap
-    if sys.byteorder == "big":
-      saved_model_utils.swap_function_tensor_content(meta_graph_def, "little",
-                                                     "big")
-    if (tags is not None
-        and set(tags) != set(meta_graph_def.meta_info_def.tags)):
+    saved_tags = meta_graph_def.meta_info_def.tags
+    # More distinct tags than saved ones can't match, which is checked without
+    # building a set. The saved tags may contain duplicates, so equal lengths
+    # still need the set comparison.
+    if (tag_set is not None
+        and (len(tag_set) > len(saved_tags)
+             or tag_set != frozenset(saved_tags))):
       raise ValueError(
           ("The SavedModel at {} has one MetaGraph with tags {}, but got an "
            "incompatible argument tags={} to tf.saved_model.load. You may omit "
            "it, pass 'None', or pass matching tags.")
-          .format(export_dir, meta_graph_def.meta_info_def.tags, tags))
+          .format(export_dir, saved_tags, tags))
     object_graph_proto = meta_graph_def.object_graph_def
 
     ckpt_options = checkpoint_options.CheckpointOptions(
@@ -909,8 +1176,14 @@ def load_internal(export_dir, tags=None, options=None, loader_cls=Loader,
             "to the io_device such as '/job:localhost'."
         )
       root = loader.get(0)
-      if isinstance(loader, Loader):
-        root.graph_debug_info = loader.adjust_debug_info_func_names(debug_info)
+      # The debug info is only read when the saved root object is loaded. Loads
+      # with node filters that exclude it only get a placeholder root, which
+      # isn't returned.
+      if isinstance(loader, Loader) and (
+          loader._filtered_nodes is None  # pylint: disable=protected-access
+          or 0 in loader._filtered_nodes):  # pylint: disable=protected-access
+        root.graph_debug_info = loader.adjust_debug_info_func_names(
+            _read_debug_info(export_dir))
     root.tensorflow_version = meta_graph_def.meta_info_def.tensorflow_version
     root.tensorflow_git_version = (
         meta_graph_def.meta_info_def.tensorflow_git_version)
@@ -920,9 +1193,12 @@ def load_internal(export_dir, tags=None, options=None, loader_cls=Loader,
                        "version) cannot be loaded with node filters.")
     with ops.init_scope():
       root = load_v1_in_v2.load(export_dir, tags)
-      root.graph_debug_info = debug_info
+      root.graph_debug_info = _read_debug_info(export_dir)
 
   if filters:
-    return {node_id: loader.get(node_id) for node_id in filters}
+    # Objects passed as values of a `filters` dict have already been restored
+    # in place by the loader, and are returned as they are.
+    get = loader.get
+    return {node_path: get(node_path) for node_path in filters}
   else:
     return {"root": root}